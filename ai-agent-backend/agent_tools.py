@@ -4,17 +4,20 @@ Each tool is decorated with @tool and can be called by the LLM when needed.
 Supports multi-chain wallet connections via HOT Kit.
 """
 import asyncio
+import threading
+import uuid
 from typing import Optional, Dict, Any
-from langchain_core.tools import tool
+from langchain_core.tools import BaseTool, tool
 
 from tools import get_swap_quote as _get_swap_quote, get_available_tokens, create_near_intent_transaction
 from validators import fuzzy_match_token, validate_near_address, validate_evm_address, validate_address_for_chain, get_chain_address_format
 from knowledge_base import (
     get_available_tokens_from_api, 
-    get_token_symbols_list, 
     format_token_list_for_display,
-    format_tokens_with_chain_prefix,
-    get_token_by_symbol
+    get_chain_prefixed_token_list,
+    get_token_by_symbol,
+    get_tokens_by_symbol,
+    get_prepared_symbols
 )
 
 
@@ -28,9 +31,10 @@ async def get_available_tokens_tool() -> str:
     Returns: A formatted string with [CHAIN] TOKEN format.
     """
     try:
-        tokens = await get_available_tokens_from_api()
-        # Use chain prefix format
-        return format_tokens_with_chain_prefix(tokens, limit=80)
+        await get_available_tokens_from_api()
+        
+        # Chain prefix format, rendered once per cache fill
+        return get_chain_prefixed_token_list()
     except Exception as e:
         return f"⚠️ Can't get supported tokens for now: {str(e)}"
 
@@ -53,10 +57,10 @@ def get_token_chains_tool(token_symbol: str) -> str:
     if not tokens:
         return "⚠️ Token data not loaded yet. Please try again."
     
-    symbol_upper = token_symbol.upper().strip()
+    symbol_upper = token_symbol.strip().upper()
     
     # Find all entries for this token
-    matching_tokens = [t for t in tokens if t["symbol"].upper() == symbol_upper]
+    matching_tokens = get_tokens_by_symbol(symbol_upper, tokens)
     
     if not matching_tokens:
         return f"❌ Token '{token_symbol}' not found. Use get_available_tokens_tool to see all available tokens."
@@ -87,25 +91,30 @@ async def validate_token_names_tool(token_in: str, token_out: str) -> str:
     Returns: Validation result with suggestions if needed
     """
     try:
-        tokens = await get_available_tokens_from_api()
-        available = get_token_symbols_list(tokens)
+        await get_available_tokens_from_api()
+        available, symbols_set = get_prepared_symbols()
         
-        match_in = fuzzy_match_token(token_in, available)
-        match_out = fuzzy_match_token(token_out, available)
+        # Exact (case-insensitive) matches skip fuzzy matching entirely
+        token_in_upper = token_in.strip().upper()
+        token_out_upper = token_out.strip().upper()
+        in_valid = token_in_upper in symbols_set
+        out_valid = token_out_upper in symbols_set
         
-        if match_in['exact_match'] and match_out['exact_match']:
-            return f"✅ Both tokens are valid: {token_in.upper()} and {token_out.upper()}"
+        if in_valid and out_valid:
+            return f"✅ Both tokens are valid: {token_in_upper} and {token_out_upper}"
         
         issues = []
-        if not match_in['exact_match']:
-            if match_in['suggested_token']:
-                issues.append(f"'{token_in}' → Did you mean '{match_in['suggested_token']}'?")
+        if not in_valid:
+            match_in = fuzzy_match_token(token_in, available)
+            if match_in.suggested_token:
+                issues.append(f"'{token_in}' → Did you mean '{match_in.suggested_token}'?")
             else:
                 issues.append(f"'{token_in}' is not recognized")
         
-        if not match_out['exact_match']:
-            if match_out['suggested_token']:
-                issues.append(f"'{token_out}' → Did you mean '{match_out['suggested_token']}'?")
+        if not out_valid:
+            match_out = fuzzy_match_token(token_out, available)
+            if match_out.suggested_token:
+                issues.append(f"'{token_out}' → Did you mean '{match_out.suggested_token}'?")
             else:
                 issues.append(f"'{token_out}' is not recognized")
         
@@ -159,12 +168,16 @@ def get_swap_quote_tool(
                 chain_key, addr = pair.split(":", 1)
                 addr_map[chain_key.strip().lower()] = addr.strip()
     
+    # Normalize symbols once
+    token_in = token_in.upper()
+    token_out = token_out.upper()
+    
     # Get token cache
-    from knowledge_base import _token_cache, get_token_by_symbol
+    from knowledge_base import _token_cache
     tokens = _token_cache if _token_cache else []
     
     # ── SAFETY CHECK 1: Validate source token exists ──
-    source_token = get_token_by_symbol(token_in.upper(), tokens, chain=None)
+    source_token = get_token_by_symbol(token_in, tokens, chain=None)
     if not source_token:
         return f"❌ Token '{token_in}' not found. Use get_available_tokens_tool to see available tokens."
     
@@ -173,7 +186,7 @@ def get_swap_quote_tool(
     # Try to find source token on a connected chain specifically
     source_on_connected = None
     for chain in user_chains:
-        t = get_token_by_symbol(token_in.upper(), tokens, chain=chain)
+        t = get_token_by_symbol(token_in, tokens, chain=chain)
         if t:
             source_on_connected = t
             source_chain = chain
@@ -184,23 +197,22 @@ def get_swap_quote_tool(
         # Check which chains this token exists on
         all_chains_for_token = [
             t.get("blockchain", "near").upper() 
-            for t in tokens 
-            if t["symbol"].upper() == token_in.upper()
+            for t in get_tokens_by_symbol(token_in, tokens)
         ]
         unique_chains = list(set(all_chains_for_token))
         
         return (
             f"❌ **Cannot Swap — Wallet Not Connected**\n\n"
-            f"**{token_in.upper()}** exists on: {', '.join(unique_chains)}\n"
+            f"**{token_in}** exists on: {', '.join(unique_chains)}\n"
             f"**Your connected wallets**: {', '.join(c.upper() for c in user_chains)}\n\n"
-            f"You need a connected wallet on one of those chains to swap {token_in.upper()}.\n"
+            f"You need a connected wallet on one of those chains to swap {token_in}.\n"
             f"Please connect the appropriate wallet via HOT Kit."
         )
     
     # ── SAFETY CHECK 3: Resolve destination ──
-    dest_token = get_token_by_symbol(token_out.upper(), tokens, chain=destination_chain)
+    dest_token = get_token_by_symbol(token_out, tokens, chain=destination_chain)
     if not dest_token:
-        dest_token = get_token_by_symbol(token_out.upper(), tokens)
+        dest_token = get_token_by_symbol(token_out, tokens)
     
     if not dest_token:
         return f"❌ Token '{token_out}' not found. Use get_available_tokens_tool to see available tokens."
@@ -231,7 +243,7 @@ def get_swap_quote_tool(
             expected_format = get_chain_address_format(dest_chain)
             return (
                 f"⚠️ **Cross-Chain Swap — Address Needed**\n\n"
-                f"You want to receive **{token_out.upper()}** on **{dest_chain.upper()}** chain.\n"
+                f"You want to receive **{token_out}** on **{dest_chain.upper()}** chain.\n"
                 f"You don't have a {dest_chain.upper()} wallet connected.\n\n"
                 f"Please provide your **{dest_chain.upper()} wallet address** ({expected_format})."
             )
@@ -240,16 +252,15 @@ def get_swap_quote_tool(
         recipient = addr_map.get(source_chain, account_id)
     
     # ── Get the actual quote ──
-    quote = _get_swap_quote(token_in.upper(), token_out.upper(), amount, recipient_id=recipient)
+    quote = _get_swap_quote(token_in, token_out, amount, recipient_id=recipient)
     
     if "error" in quote:
         return f"❌ Error getting quote: {quote['error']}"
     
-    # Store quote globally for confirmation
-    global _last_quote
-    _last_quote = {
-        "token_in": token_in.upper(),
-        "token_out": token_out.upper(),
+    # Store quote for confirmation
+    quote_id = store_quote({
+        "token_in": token_in,
+        "token_out": token_out,
         "amount": amount,
         "amount_out": quote['amount_out'],
         "min_amount_out": quote['amount_out'] * 0.99,  # 1% slippage
@@ -258,7 +269,7 @@ def get_swap_quote_tool(
         "is_cross_chain": is_cross_chain,
         "dest_chain": dest_chain,
         "source_chain": source_chain
-    }
+    })
     
     # Format response
     dest_info = f" on **{dest_chain.upper()}**" if is_cross_chain else ""
@@ -267,47 +278,65 @@ def get_swap_quote_tool(
     
     return (
         f"✅ **Swap Quote**\n"
-        f"**Swap**: {amount} [{source_chain.upper()}] {token_in.upper()} → ~{quote['amount_out']:.6f} [{dest_chain.upper()}] {token_out.upper()}\n"
-        f"**Rate**: 1 {token_in.upper()} = {quote['rate']:.6f} {token_out.upper()}\n"
+        f"**Swap**: {amount} [{source_chain.upper()}] {token_in} → ~{quote['amount_out']:.6f} [{dest_chain.upper()}] {token_out}\n"
+        f"**Rate**: 1 {token_in} = {quote['rate']:.6f} {token_out}\n"
         f"**Recipient**: `{recipient}`{dest_info}\n"
         f"{addr_note}\n\n"
-        f"[QUOTE_ID: {id(_last_quote)}]\n"
-        f"If user confirms, call confirm_swap_tool() to prepare the transaction."
+        f"[QUOTE_ID: {quote_id}]\n"
+        f"If user confirms, call confirm_swap_tool(quote_id=\"{quote_id}\") to prepare the transaction."
     )
 
 
 
-# Global storage for last quote
-_last_quote = None
+# Quotes by QUOTE_ID awaiting confirmation (oldest evicted beyond _MAX_QUOTES)
+# Sync tools run in worker threads when invoked concurrently, so writes are locked
+_quotes: Dict[str, Dict[str, Any]] = {}
+_MAX_QUOTES = 1000
+_quote_lock = threading.Lock()
+
+
+def store_quote(quote: Dict[str, Any]) -> str:
+    """Store a quote for later confirmation and return its quote ID"""
+    quote_id = uuid.uuid4().hex
+    with _quote_lock:
+        _quotes[quote_id] = quote
+        while len(_quotes) > _MAX_QUOTES:
+            del _quotes[next(iter(_quotes))]
+    return quote_id
+
+
+def get_stored_quote(quote_id: str) -> Optional[Dict[str, Any]]:
+    """Get a stored quote by its quote ID, or None if unknown/expired"""
+    return _quotes.get(quote_id) if quote_id else None
 
 
 @tool
-def confirm_swap_tool() -> str:
+def confirm_swap_tool(quote_id: str = "") -> str:
     """
     Confirm and prepare the swap transaction after user approves the quote.
     Call this ONLY when user explicitly confirms (says yes, okay, proceed, go ahead, etc).
-    This uses the most recent quote that was provided to the user.
+    
+    Args:
+        quote_id: The QUOTE_ID of the quote being confirmed (defaults to the user's latest quote)
     
     Returns: Status message about transaction preparation
     """
-    global _last_quote
+    quote = get_stored_quote(quote_id)
     
-    if not _last_quote:
+    if not quote:
         return "❌ No recent quote found. Please get a quote first by asking for a swap."
     
     try:
-        from tools import create_near_intent_transaction
-        
         tx_payload = create_near_intent_transaction(
-            _last_quote["token_in"],
-            _last_quote["token_out"],
-            _last_quote["amount"],
-            _last_quote["min_amount_out"],
-            _last_quote["deposit_address"]
+            quote["token_in"],
+            quote["token_out"],
+            quote["amount"],
+            quote["min_amount_out"],
+            quote["deposit_address"]
         )
         
         # Return special marker that agents.py will detect
-        return f"[TRANSACTION_READY] Transaction prepared successfully. User needs to sign in their wallet."
+        return f"[TRANSACTION_READY] [QUOTE_ID: {quote_id}] Transaction prepared successfully. User needs to sign in their wallet."
         
     except Exception as e:
         return f"❌ Error preparing transaction: {str(e)}"
@@ -391,10 +420,10 @@ async def check_payment_status_tool(memo: str = "", sender_id: str = "", limit:
     
     Returns: Payment history or setup instructions
     """
-    from hot_pay import get_payment_history
+    from hot_pay import get_payment_history_bulk
     
-    result = await get_payment_history(
-        limit=limit,
+    result = await get_payment_history_bulk(
+        total=limit,
         memo=memo if memo else None,
         sender_id=sender_id if sender_id else None,
     )
@@ -451,3 +480,6 @@ TOOL_LIST = [
     create_payment_link_tool,
     check_payment_status_tool,
 ]
+
+# Tool lookup by name for O(1) dispatch of LLM tool calls
+TOOL_MAP: Dict[str, BaseTool] = {t.name: t for t in TOOL_LIST}
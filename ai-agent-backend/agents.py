@@ -2,17 +2,23 @@
 LangChain agent for NEAR token swaps using tool calling.
 LLM decides which tools to call based on user query.
 """
+import asyncio
 import json
+import logging
 import os
-from typing import Dict, Any
+import re
+from typing import Dict, Any, List, Optional, Callable, Awaitable
 
 from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
 
-from agent_tools import TOOL_LIST
-from prompts import MASTER_SYSTEM_PROMPT
+from agent_tools import TOOL_LIST, TOOL_MAP, get_available_tokens_tool, get_stored_quote
+from prompts import MASTER_SYSTEM_PROMPT, cached_system_blocks
+from tools import create_near_intent_transaction
+
 
+logger = logging.getLogger(__name__)
 
 # Initialize LLM with NEAR AI endpoint
 api_key = os.getenv("NEAR_AI_API_KEY") or os.getenv("OPENAI_API_KEY")
@@ -24,31 +30,110 @@ llm = ChatOpenAI(
     openai_api_base="https://cloud-api.near.ai/v1"
 )
 
-# Bind tools to LLM
-llm_with_tools = llm.bind_tools(TOOL_LIST)
+# Bind tools to LLM (independent tool calls in one turn are executed concurrently).
+# The prompt asks for parallel calls; set PARALLEL_TOOL_CALLS=1 to also send the
+# explicit parallel_tool_calls flag on endpoints known to accept it.
+if os.getenv("PARALLEL_TOOL_CALLS", "").lower() in ("1", "true"):
+    llm_with_tools = llm.bind_tools(TOOL_LIST, parallel_tool_calls=True)
+else:
+    llm_with_tools = llm.bind_tools(TOOL_LIST)
 
 # System message for the agent
+# (tool names and argument schemas already reach the model through bind_tools)
 SYSTEM_MESSAGE = MASTER_SYSTEM_PROMPT + """
-
-**Runtime Tool Reference (quick lookup):**
-- get_available_tokens_tool → List ALL supported tokens (use ONLY for "show all tokens" queries)
-- get_token_chains_tool → Chains for a SPECIFIC token (use for "options for ETH", "where is AURORA?", etc.)
-- validate_token_names_tool → Fix token name typos/misspellings
-- get_swap_quote_tool → Get a live swap quote (for new swap requests only)
-- confirm_swap_tool → Confirm and prepare transaction (after user says "yes" to a quote)
-- create_payment_link_tool → Create HOT Pay payment link (for "create payment link", "accept payment", "generate invoice")
-- check_payment_status_tool → Check received payments (for "has anyone paid?", "payment status")
-
-REMEMBER: If user asks about a SPECIFIC token → get_token_chains_tool. If user wants ALL tokens → get_available_tokens_tool.
-Payment links/invoices → create_payment_link_tool. Payment status → check_payment_status_tool.
+If multiple independent facts are needed (e.g., validating token names AND checking a token's chains), emit all tool calls in a single response — they are executed in parallel.
 Be conversational, friendly, and concise. You are Neptune AI.
 """
 
+# Built once and reused as the first message of every LLM call.
+# OpenAI-compatible endpoints cache the stable prefix automatically; set
+# PROMPT_CACHE_CONTROL=1 for providers that need an explicit cache_control marker.
+if os.getenv("PROMPT_CACHE_CONTROL", "").lower() in ("1", "true"):
+    _SYSTEM_PROMPT_MESSAGE = SystemMessage(content=cached_system_blocks(SYSTEM_MESSAGE))
+else:
+    _SYSTEM_PROMPT_MESSAGE = SystemMessage(content=SYSTEM_MESSAGE)
+
+
+# Replies that confirm a pending swap (matched as whole words)
+_CONFIRM_WORDS = frozenset({"yes", "confirm", "go", "proceed", "ok", "sure", "yep", "yeah"})
+_WORD_RE = re.compile(r"[a-z]+")
+
+# History roles → LangChain message classes
+_ROLE_MAP = {"user": HumanMessage, "ai": AIMessage}
+
+# Whole-message "list all tokens" queries, answered from the token cache without the LLM
+_LIST_TOKENS_RE = re.compile(
+    r"^(?:(?:what|which)\s+(?:tokens|coins)\s+(?:are\s+(?:available|supported)|(?:do\s+you|can\s+i)\s+(?:support|swap|trade))"
+    r"|(?:list|show(?:\s+me)?)\s+(?:all\s+)?(?:the\s+)?(?:available\s+|supported\s+)?(?:tokens|coins))[\s?.!]*$"
+)
+
+# Quote IDs in get_swap_quote_tool / confirm_swap_tool results
+_QUOTE_ID_RE = re.compile(r"\[QUOTE_ID: ([0-9a-f]+)\]")
+
+
+def _idle_state(last_quote_id: Optional[str]) -> Dict[str, Any]:
+    """IDLE session state, keeping the session's latest quote ID for confirmation"""
+    if last_quote_id:
+        return {"step": "IDLE", "last_quote_id": last_quote_id}
+    return {"step": "IDLE"}
+
+
+def _build_tx_from_quote(quote: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Build the unsigned NEAR Intents transaction payload for a stored quote"""
+    return create_near_intent_transaction(
+        quote["token_in"],
+        quote["token_out"],
+        quote["amount"],
+        quote["min_amount_out"],
+        quote["deposit_address"]
+    )
+
+
+async def _execute_tool_call(tool_call: Dict[str, Any], session_quote_id: Optional[str] = None) -> str:
+    """
+    Execute a single LLM tool call and return its result as text.
+    Errors are returned as text so the LLM can explain them to the user.
+    """
+    tool_name = tool_call["name"]
+    tool_args = tool_call["args"]
+    
+    # Confirmations fall back to the session's latest quote when the LLM
+    # omits the QUOTE_ID or passes one that isn't stored
+    if tool_name == "confirm_swap_tool" and get_stored_quote(tool_args.get("quote_id", "")) is None:
+        tool_args = {**tool_args, "quote_id": session_quote_id or ""}
+    
+    logger.debug("[AGENT] Calling tool: %s with args: %s", tool_name, tool_args)
+    
+    # Special handling for transaction preparation
+    if tool_name == "prepare_swap_transaction_tool":
+        try:
+            _build_tx_from_quote(tool_args)
+            return "✅ Transaction prepared successfully and ready for user signature."
+        except Exception as e:
+            logger.error("[AGENT] Transaction prep error: %s", e)
+            return f"❌ Error preparing transaction: {str(e)}"
+    
+    tool = TOOL_MAP.get(tool_name)
+    if tool is None:
+        tool_result = f"Tool {tool_name} not found"
+        logger.warning("[AGENT] %s", tool_result)
+        return tool_result
+    
+    try:
+        tool_result = await tool.ainvoke(tool_args)
+        logger.debug("[AGENT] Tool result: %.200s", tool_result)
+    except Exception as e:
+        logger.exception("[AGENT] ERROR in tool execution: %s", e)
+        tool_result = f"Error calling tool: {str(e)}"
+    
+    return tool_result
+
 
 async def process_message(
     user_msg: str,
     session_state: Dict[str, Any],
-    user_context: Dict[str, Any] = {}
+    user_context: Dict[str, Any] = {},
+    on_token: Optional[Callable[[str], Awaitable[None]]] = None
 ) -> Dict[str, Any]:
     """
     Process user message using tool-calling LLM.
@@ -58,41 +143,37 @@ async def process_message(
         user_msg: User's message
         session_state: Current session state
         user_context: User context (account_id, etc.)
+        on_token: Optional async callback receiving the final LLM response
+            as it streams (tool-calling turns only); the full text is
+            still returned in "response"
     
     Returns:
         Dict with response, action, payload, and new state
     """
     account_id = user_context.get("account_id", "Not connected")
     current_step = session_state.get("step", "IDLE")
+    last_quote_id = session_state.get("last_quote_id")
     
-    print(f"[AGENT] Processing: {user_msg} | Step: {current_step} | Account: {account_id}")
+    logger.info("[AGENT] Processing: %s | Step: %s | Account: %s", user_msg, current_step, account_id)
     
     # Ensure token cache is populated for cross-chain detection
     try:
         from knowledge_base import _token_cache, get_available_tokens_from_api
         if not _token_cache:
-            print("[AGENT] Populating token cache...")
+            logger.info("[AGENT] Populating token cache...")
             await get_available_tokens_from_api()
     except Exception as e:
-        print(f"[AGENT] Warning: Could not populate token cache: {e}")
+        logger.warning("[AGENT] Could not populate token cache: %s", e)
     
     # Handle confirmation state
     if current_step == "WAITING_CONFIRMATION":
         pending = session_state.get("pending_quote", {})
         
         user_lower = user_msg.lower().strip()
-        is_confirmed = any(word in user_lower for word in ["yes", "confirm", "go", "proceed", "ok", "sure", "yep", "yeah"])
+        is_confirmed = not _CONFIRM_WORDS.isdisjoint(_WORD_RE.findall(user_lower))
         
         if is_confirmed:
-            from tools import create_near_intent_transaction
-            
-            tx_payload = create_near_intent_transaction(
-                pending["token_in"],
-                pending["token_out"],
-                pending["amount"],
-                pending["min_amount_out"],
-                pending["deposit_address"]
-            )
+            tx_payload = _build_tx_from_quote(pending)
             
             return {
                 "response": "✅ Perfect! Transaction is ready. Please review and sign it in your wallet.",
@@ -106,6 +187,14 @@ async def process_message(
                 "new_state": {"step": "IDLE"}
             }
     
+    # Plain "what tokens are available" queries skip both LLM calls
+    if _LIST_TOKENS_RE.match(user_msg.lower().strip()):
+        logger.info("[AGENT] Serving token list directly")
+        return {
+            "response": await get_available_tokens_tool.ainvoke({}),
+            "new_state": _idle_state(last_quote_id)
+        }
+    
     # Process with LLM and tools
     try:
         # Convert history to LangChain messages
@@ -115,16 +204,21 @@ async def process_message(
         # Tool calling with long history can cause problems
         recent_history = history[-6:] if len(history) > 6 else history
         
-        messages = [SystemMessage(content=SYSTEM_MESSAGE)]
+        # Context is append-only so the cached prefix stays valid across turns:
+        # static system prompt (+ tool schemas via bind_tools) -> history ->
+        # current user message carrying the dynamic wallet context.
+        # Nothing per-request may be inserted before the history.
+        messages = [_SYSTEM_PROMPT_MESSAGE]
         
         # Add recent conversation history only
-        for msg in recent_history:
-            if msg["role"] == "user":
-                messages.append(HumanMessage(content=msg["content"]))
-            elif msg["role"] == "ai":
-                messages.append(AIMessage(content=msg["content"]))
+        messages.extend(
+            _ROLE_MAP[msg["role"]](content=msg["content"])
+            for msg in recent_history
+            if msg["role"] in _ROLE_MAP
+        )
         
-        # Add current message with wallet context (multi-chain via HOT Kit)
+        # Add current message with wallet context (multi-chain via HOT Kit);
+        # wallet/balance info lives only in this last turn, never in the system prompt
         connected_chains = user_context.get("connected_chains", [])
         wallet_addresses = user_context.get("wallet_addresses", {})
         balances = user_context.get("balances", {})
@@ -142,105 +236,77 @@ async def process_message(
         
         messages.append(HumanMessage(content=f"{user_msg}\n\n{wallet_info}"))
         
-        print(f"[AGENT] Sending {len(messages)} messages (including {len(recent_history)} recent history items)")
+        logger.debug("[AGENT] Sending %d messages (including %d recent history items)", len(messages), len(recent_history))
         
         # Call LLM
         response = await llm_with_tools.ainvoke(messages)
         
         # Check if LLM wants to call tools
         if response.tool_calls:
-            print(f"[AGENT] LLM calling {len(response.tool_calls)} tool(s)")
+            logger.info("[AGENT] LLM calling %d tool(s)", len(response.tool_calls))
             
-            # Execute each tool call
-            tool_messages = []
-            transaction_prepared = False
-            tx_payload = None
+            # Execute all tool calls concurrently (results keep tool_calls order)
+            tool_results = await asyncio.gather(
+                *(_execute_tool_call(tool_call, last_quote_id) for tool_call in response.tool_calls),
+                return_exceptions=True
+            )
             
-            for tool_call in response.tool_calls:
-                tool_name = tool_call["name"]
-                tool_args = tool_call["args"]
-                
-                print(f"[AGENT] Calling tool: {tool_name} with args: {tool_args}")
-                
-                # Special handling for transaction preparation
-                if tool_name == "prepare_swap_transaction_tool":
-                    transaction_prepared = True
-                    # Get the actual transaction payload
-                    from tools import create_near_intent_transaction
-                    try:
-                        tx_payload = create_near_intent_transaction(
-                            tool_args["token_in"],
-                            tool_args["token_out"],
-                            tool_args["amount"],
-                            tool_args["min_amount_out"],
-                            tool_args["deposit_address"]
-                        )
-                        tool_result = "✅ Transaction prepared successfully and ready for user signature."
-                    except Exception as e:
-                        tool_result = f"❌ Error preparing transaction: {str(e)}"
-                        print(f"[AGENT] Transaction prep error: {e}")
-                else:
-                    # Find and execute the tool normally
-                    tool_result = None
-                    for tool in TOOL_LIST:
-                        if tool.name == tool_name:
-                            try:
-                                print(f"[AGENT] Executing tool: {tool_name}")
-                                tool_result = await tool.ainvoke(tool_args)
-                                print(f"[AGENT] Tool result: {tool_result[:200] if isinstance(tool_result, str) else tool_result}")
-                            except Exception as e:
-                                print(f"[AGENT] ERROR in tool execution: {e}")
-                                import traceback
-                                traceback.print_exc()
-                                tool_result = f"Error calling tool: {str(e)}"
-                            break
-                    
-                    if tool_result is None:
-                        tool_result = f"Tool {tool_name} not found"
-                        print(f"[AGENT] WARNING: {tool_result}")
+            tool_messages = []
+            ready_quote = None
+            for tool_call, tool_result in zip(response.tool_calls, tool_results):
+                if isinstance(tool_result, BaseException):
+                    logger.error("[AGENT] ERROR in tool execution: %s", tool_result)
+                    tool_result = f"Error calling tool: {str(tool_result)}"
+                elif isinstance(tool_result, str):
+                    # New quotes become the session's latest; a prepared transaction
+                    # (confirm_swap_tool) names the quote the user is signing
+                    quote_id_match = _QUOTE_ID_RE.search(tool_result)
+                    if quote_id_match and tool_result.startswith("[TRANSACTION_READY]"):
+                        ready_quote = get_stored_quote(quote_id_match.group(1))
+                    elif quote_id_match:
+                        last_quote_id = quote_id_match.group(1)
                 
                 # Add tool result using HumanMessage (NEAR AI workaround)
                 # NEAR AI ignores ToolMessage content, so we use HumanMessage instead
                 tool_messages.append(HumanMessage(
-                    content=f"Tool '{tool_name}' returned:\n{tool_result}"
+                    content=f"Tool '{tool_call['name']}' returned:\n{tool_result}"
                 ))
             
+            # Transaction prepared by confirm_swap_tool: return the payload right away,
+            # the fixed signing message replaces the final LLM response
+            if ready_quote:
+                try:
+                    tx_payload = _build_tx_from_quote(ready_quote)
+                    logger.info("[AGENT] Transaction prepared, returning to frontend for signing")
+                    return {
+                        "response": "✅ Transaction prepared! Please review and sign it in your wallet.",
+                        "action": "SIGN_TRANSACTION",
+                        "payload": tx_payload,
+                        "new_state": {"step": "IDLE"}
+                    }
+                except Exception as e:
+                    logger.error("[AGENT] Error creating transaction payload: %s", e)
+            
             # Get final response from LLM with tool results
-            print(f"[AGENT] Getting final response from LLM with {len(tool_messages)} tool results")
+            logger.debug("[AGENT] Getting final response from LLM with %d tool results", len(tool_messages))
             
-            # Build the final message sequence for tool response
+            # Build the final message sequence for tool response by extending `messages`
+            # (system prompt, history and the user's message with wallet context).
             # NEAR AI workaround: Do NOT include the AIMessage with tool_calls
             # (NEAR AI returns empty responses when it encounters tool_calls in AIMessage).
-            # Instead, merge user query + tool results into a single HumanMessage
-            # to avoid consecutive HumanMessages which also cause empty responses.
-            tool_response_messages = [SystemMessage(content=SYSTEM_MESSAGE)]
-            
-            # Include history
-            for msg in recent_history:
-                if msg["role"] == "user":
-                    tool_response_messages.append(HumanMessage(content=msg["content"]))
-                elif msg["role"] == "ai":
-                    tool_response_messages.append(AIMessage(content=msg["content"]))
-            
-            # Combine user message + tool results into ONE HumanMessage
-            # This avoids consecutive HumanMessages that confuse NEAR AI
-            # Use a bridge AIMessage to separate user query from tool results
-            # so the LLM understands: user asked → I fetched data → here it is
+            # Instead, use a bridge AIMessage to separate user query from tool results
+            # so the LLM understands: user asked → I fetched data → here it is.
+            # This also avoids consecutive HumanMessages which cause empty responses.
             tool_results_text = "\n\n".join(
                 msg.content for msg in tool_messages
             )
             
-            # User's original question
-            connected_chains = user_context.get("connected_chains", [])
-            chains_str = ', '.join(connected_chains) if connected_chains else 'none'
-            tool_response_messages.append(HumanMessage(content=f"{user_msg}\n\n[User wallet: {account_id} | connected_chains: [{chains_str}]]"))
-            
             # Bridge AIMessage: makes the LLM think it "decided" to fetch data
             tool_names_called = ", ".join(tc["name"] for tc in response.tool_calls)
-            tool_response_messages.append(AIMessage(content=f"Let me look that up using {tool_names_called}."))
+            messages.append(AIMessage(content=f"Let me look that up using {tool_names_called}."))
             
             # Tool results as a HumanMessage with clear instruction
-            tool_response_messages.append(HumanMessage(
+            messages.append(HumanMessage(
                 content=(
                     f"Here are the results:\n\n{tool_results_text}\n\n"
                     f"Now respond to the user based on this data. Be helpful and concise."
@@ -248,71 +314,42 @@ async def process_message(
             ))
             
             # Debug: Show message types being sent
-            msg_types = [f"{type(m).__name__}" for m in tool_response_messages]
-            print(f"[AGENT] Tool response sequence: {' → '.join(msg_types)}")
+            if logger.isEnabledFor(logging.DEBUG):
+                msg_types = [type(m).__name__ for m in messages]
+                logger.debug("[AGENT] Tool response sequence: %s", " → ".join(msg_types))
             
-            print(f"[AGENT] Sending {len(tool_response_messages)} messages to LLM for final response")
-            final_response = await llm.ainvoke(tool_response_messages)
+            logger.debug("[AGENT] Sending %d messages to LLM for final response", len(messages))
             
-            print(f"[AGENT] LLM raw response type: {type(final_response)}")
-            print(f"[AGENT] LLM response content: {final_response.content if hasattr(final_response, 'content') else final_response}")
+            # Stream the final response so callers can forward tokens as they arrive
+            chunks = []
+            async for chunk in llm.astream(messages):
+                if chunk.content:
+                    chunks.append(chunk.content)
+                    if on_token:
+                        await on_token(chunk.content)
             
-            response_text = final_response.content if hasattr(final_response, 'content') else str(final_response)
+            response_text = "".join(chunks)
             
             if not response_text or response_text.strip() == "":
-                print("[AGENT] WARNING: Empty response from LLM!")
+                logger.warning("[AGENT] Empty response from LLM!")
                 response_text = "I apologize, I encountered an issue generating a response. Could you please rephrase your request?"
             
-            print(f"[AGENT] Final response ({len(response_text)} chars): {response_text[:200]}")
-            
-            # Check if transaction was prepared by confirm_swap_tool
-            transaction_prepared = False
-            for msg in tool_messages:
-                if hasattr(msg, 'content') and '[TRANSACTION_READY]' in msg.content:
-                    transaction_prepared = True
-                    break
+            logger.debug("[AGENT] Final response (%d chars): %.200s", len(response_text), response_text)
             
-            if transaction_prepared:
-                # Get the actual transaction payload
-                from agent_tools import _last_quote
-                if _last_quote:
-                    from tools import create_near_intent_transaction
-                    try:
-                        tx_payload = create_near_intent_transaction(
-                            _last_quote["token_in"],
-                            _last_quote["token_out"],
-                            _last_quote["amount"],
-                            _last_quote["min_amount_out"],
-                            _last_quote["deposit_address"]
-                        )
-                        print(f"[AGENT] Transaction prepared, returning to frontend for signing")
-                        return {
-                            "response": "✅ Transaction prepared! Please review and sign it in your wallet.",
-                            "action": "SIGN_TRANSACTION",
-                            "payload": tx_payload,
-                            "new_state": {"step": "IDLE"}
-                        }
-                    except Exception as e:
-                        print(f"[AGENT] Error creating transaction payload: {e}")
         else:
             # No tools needed, use direct response
             response_text = response.content
-            print(f"[AGENT] Direct response (no tools): {response_text[:200]}")
+            logger.debug("[AGENT] Direct response (no tools): %.200s", response_text)
         
         return {
             "response": response_text,
-            "new_state": {"step": "IDLE"}
+            "new_state": _idle_state(last_quote_id)
         }
         
     except Exception as e:
-        print(f"[AGENT] Error: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("[AGENT] Error: %s", e)
         return {
             "response": "I encountered an error processing your request. Could you try rephrasing?",
-            "new_state": {"step": "IDLE"}
+            "new_state": _idle_state(last_quote_id)
         }
 
-
-# Import asyncio for async tool execution
-import asyncio
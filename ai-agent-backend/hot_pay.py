@@ -12,10 +12,12 @@ HOT PAY is a non-custodial open source crypto payments platform.
 Docs: https://hot-labs.gitbook.io/hot-pay
 API:  https://api.hot-labs.org
 """
+import asyncio
 import os
 import httpx
+import orjson
 from typing import Optional, Dict, Any, List
-from urllib.parse import urlencode
+from urllib.parse import urlencode, quote_plus
 
 HOT_PAY_BASE_URL = "https://api.hot-labs.org"
 HOT_PAY_FRONTEND_URL = "https://pay.hot-labs.org"
@@ -23,6 +25,21 @@ HOT_PAY_FRONTEND_URL = "https://pay.hot-labs.org"
 # API token for partner endpoints (optional, for payment tracking)
 HOT_PAY_API_TOKEN = os.getenv("HOT_PAY_API_TOKEN", "")
 
+# Upper bound for get_payment_history_bulk (at most 4 concurrent pages of 50)
+MAX_BULK_PAYMENTS = 200
+
+# Shared HTTP client so keep-alive connections are reused across API calls
+_client = httpx.AsyncClient(
+    timeout=10.0,
+    http2=True,
+    limits=httpx.Limits(max_keepalive_connections=10),
+)
+
+
+async def close_http_client() -> None:
+    """Close the shared HOT Pay HTTP client (call on application shutdown)."""
+    await _client.aclose()
+
 
 def create_payment_link(
     merchant_wallet: str,
@@ -47,23 +64,24 @@ def create_payment_link(
     Returns:
         Dict with payment_url, amount, token, memo
     """
-    # Build query params for HOT Pay
+    token = token.upper()
+    
+    # Build query params for HOT Pay (empty memo is left out)
     params = {
         "to": merchant_wallet,
         "amount": str(amount),
-        "token": token.upper(),
+        "token": token,
+        "memo": memo or None,
     }
+    query = urlencode({k: v for k, v in params.items() if v}, quote_via=quote_plus)
     
-    if memo:
-        params["memo"] = memo
-    
-    payment_url = f"{HOT_PAY_FRONTEND_URL}/?{urlencode(params)}"
+    payment_url = f"{HOT_PAY_FRONTEND_URL}/?{query}"
     
     return {
         "payment_url": payment_url,
         "merchant_wallet": merchant_wallet,
         "amount": amount,
-        "token": token.upper(),
+        "token": token,
         "memo": memo,
         "description": description,
         "note": "Anyone can pay using this link from 30+ chains with any token. You will receive the specified token on NEAR.",
@@ -110,18 +128,51 @@ async def get_payment_history(
         params["sender_id"] = sender_id
     
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{HOT_PAY_BASE_URL}/partners/processed_payments",
-                headers={"Authorization": HOT_PAY_API_TOKEN},
-                params=params,
-                timeout=10.0,
-            )
-            response.raise_for_status()
-            return response.json()
+        response = await _client.get(
+            f"{HOT_PAY_BASE_URL}/partners/processed_payments",
+            headers={"Authorization": HOT_PAY_API_TOKEN},
+            params=params,
+        )
+        response.raise_for_status()
+        return orjson.loads(response.content)
     except httpx.HTTPStatusError as e:
         if e.response.status_code == 401:
             return {"error": "Invalid HOT Pay API token. Check your HOT_PAY_API_TOKEN."}
         return {"error": f"HOT Pay API error: {e.response.status_code}"}
     except Exception as e:
         return {"error": f"Failed to reach HOT Pay API: {str(e)}"}
+
+
+async def get_payment_history_bulk(
+    total: int,
+    page_size: int = 50,
+    **filters: Any,
+) -> Dict[str, Any]:
+    """
+    Fetch up to `total` recent payments, requesting all pages concurrently.
+    
+    Args:
+        total: Number of payments to fetch (clamped to 1..MAX_BULK_PAYMENTS)
+        page_size: Max payments per API request (default 50)
+        **filters: Filters forwarded to get_payment_history (item_id, memo, sender_id)
+    
+    Returns:
+        Dict with the merged payments list and the first page's pagination info,
+        or the first error returned by any page
+    """
+    # Always request at least one page so configuration errors still surface, and
+    # cap the fan-out since total comes straight from LLM tool arguments
+    total = min(max(total, 1), MAX_BULK_PAYMENTS)
+    pages = await asyncio.gather(*[
+        get_payment_history(limit=min(page_size, total - offset), offset=offset, **filters)
+        for offset in range(0, total, page_size)
+    ])
+    
+    for page in pages:
+        if "error" in page:
+            return page
+    
+    return {
+        "payments": [payment for page in pages for payment in page.get("payments", [])],
+        "pagination": pages[0].get("pagination", {}) if pages else {},
+    }
@@ -2,8 +2,11 @@
 Functions to fetch and manage token information from NEAR Intents API.
 LLM will handle answering questions naturally - no hardcoded FAQs.
 """
-from typing import Dict, List, Optional
+import asyncio
+from operator import itemgetter
+from typing import Dict, FrozenSet, List, Optional, Tuple
 import httpx
+import orjson
 from datetime import datetime, timedelta
 
 # Cache for token list
@@ -11,6 +14,36 @@ _token_cache: Optional[List[Dict]] = None
 _cache_timestamp: Optional[datetime] = None
 CACHE_DURATION = timedelta(hours=6)  # Refresh every 6 hours
 
+_NEAR_SYMBOL_ALIASES = frozenset({"WNEAR", "NEAR"})
+_PRIORITY_CHAINS = frozenset({"near", "aurora"})
+
+# Lookup structures rebuilt once per cache fill (see _build_cache_indexes)
+_symbols_upper_tuple: Tuple[str, ...] = ()
+_symbols_set: FrozenSet[str] = frozenset()
+_symbols_list: List[str] = []
+_by_symbol_upper: Dict[str, List[Dict]] = {}
+_chain_prefixed_text: Optional[str] = None
+
+# Shared HTTP client so keep-alive connections are reused across refreshes
+_client = httpx.AsyncClient(
+    timeout=10.0,
+    http2=True,
+    limits=httpx.Limits(max_keepalive_connections=10)
+)
+
+# Serializes cache refills so concurrent cold-cache callers share one API fetch
+_fetch_lock = asyncio.Lock()
+
+
+async def close_http_client() -> None:
+    """Close the shared HTTP client (call on application shutdown)"""
+    await _client.aclose()
+
+
+def _is_cache_fresh() -> bool:
+    """Check whether the token cache is populated and not expired"""
+    return bool(_token_cache and _cache_timestamp and datetime.now() - _cache_timestamp < CACHE_DURATION)
+
 
 async def get_available_tokens_from_api() -> List[Dict]:
     """
@@ -20,60 +53,67 @@ async def get_available_tokens_from_api() -> List[Dict]:
     
     Raises exception if API fails - no fallback tokens.
     """
-    global _token_cache, _cache_timestamp
-    
     # Check cache first
-    if _token_cache and _cache_timestamp:
-        if datetime.now() - _cache_timestamp < CACHE_DURATION:
-            print(f"[KNOWLEDGE] Using cached token list ({len(_token_cache)} tokens)")
+    if _is_cache_fresh():
+        print(f"[KNOWLEDGE] Using cached token list ({len(_token_cache)} tokens)")
+        return _token_cache
+    
+    async with _fetch_lock:
+        # Another coroutine may have refilled the cache while we waited
+        if _is_cache_fresh():
             return _token_cache
+        return await _refresh_token_cache()
+
+
+async def _refresh_token_cache() -> List[Dict]:
+    """Fetch the token list from the 1-Click API and update the cache"""
+    global _token_cache, _cache_timestamp
     
     try:
         print("[KNOWLEDGE] Fetching token list from 1-Click API...")
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                "https://1click.chaindefuser.com/v0/tokens",
-                timeout=10.0
-            )
-            response.raise_for_status()
-            data = response.json()
+        response = await _client.get("https://1click.chaindefuser.com/v0/tokens")
+        response.raise_for_status()
+        data = orjson.loads(response.content)
         
         if not isinstance(data, list):
             print("[KNOWLEDGE] Unexpected API response format")
             raise ValueError("Can't get supported tokens - API returned unexpected format")
         
-        # Extract relevant token info
-        tokens = []
+        # Extract relevant token info, computing each token's sort key in the same pass
+        # Sort: NEAR and Aurora chains first, then alphabetically by chain and symbol
+        keyed_tokens = []
         for item in data:
-            if item.get("assetId") and item.get("symbol"):
-                # Normalize NEAR/WNEAR
-                symbol = item["symbol"]
-                if symbol.upper() in ["WNEAR", "NEAR"]:
-                    symbol = "NEAR"
-                
-                tokens.append({
-                    "symbol": symbol,
-                    "name": item.get("name", symbol),
-                    "decimals": item.get("decimals", 18),
-                    "defuseAssetId": item["assetId"],
-                    "contractAddress": item.get("contractAddress", ""),
-                    "blockchain": item.get("blockchain", "near")
-                })
+            symbol = item.get("symbol")
+            if not item.get("assetId") or not symbol:
+                continue
+            
+            # Normalize NEAR/WNEAR
+            symbol_upper = symbol.upper()
+            if symbol_upper in _NEAR_SYMBOL_ALIASES:
+                symbol = symbol_upper = "NEAR"
+            
+            blockchain = item.get("blockchain", "near")
+            chain = blockchain.lower()
+            priority = 0 if chain in _PRIORITY_CHAINS else 1
+            
+            keyed_tokens.append(((priority, chain, symbol_upper), {
+                "symbol": symbol,
+                "symbol_upper": symbol_upper,  # Canonical form for lookups
+                "name": item.get("name", symbol),
+                "decimals": item.get("decimals", 18),
+                "defuseAssetId": item["assetId"],
+                "contractAddress": item.get("contractAddress", ""),
+                "blockchain": blockchain
+            }))
         
-        if not tokens:
+        if not keyed_tokens:
             raise ValueError("Can't get supported tokens - API returned empty list")
         
-        # Sort: NEAR chain first, then alphabetically by chain
-        def sort_key(t):
-            chain = t.get("blockchain", "near").lower()
-            # NEAR and Aurora first (priority 0), then others alphabetically
-            if chain in ["near", "aurora"]:
-                return (0, chain, t["symbol"].upper())
-            return (1, chain, t["symbol"].upper())
-        
-        sorted_tokens = sorted(tokens, key=sort_key)
+        keyed_tokens.sort(key=itemgetter(0))
+        sorted_tokens = [token for _, token in keyed_tokens]
         
-        # Update cache
+        # Update cache (indexes first so readers never see a cache without them)
+        _build_cache_indexes(sorted_tokens)
         _token_cache = sorted_tokens
         _cache_timestamp = datetime.now()
         
@@ -98,8 +138,44 @@ async def get_available_tokens_from_api() -> List[Dict]:
 
 
 
+def _build_cache_indexes(tokens: List[Dict]) -> None:
+    """
+    Rebuild the per-cache lookup structures for a fresh token list.
+    Lookups on the cached list then avoid rescanning every token.
+    """
+    global _symbols_upper_tuple, _symbols_set, _symbols_list, _by_symbol_upper, _chain_prefixed_text
+    
+    by_symbol: Dict[str, List[Dict]] = {}
+    for token in tokens:
+        by_symbol.setdefault(token["symbol_upper"], []).append(token)
+    
+    _by_symbol_upper = by_symbol
+    _symbols_upper_tuple = tuple(by_symbol)
+    _symbols_set = frozenset(by_symbol)
+    _symbols_list = [t["symbol"] for t in tokens]
+    _chain_prefixed_text = format_tokens_with_chain_prefix(tokens, limit=80)
+
+
+def get_prepared_symbols() -> Tuple[Tuple[str, ...], FrozenSet[str]]:
+    """
+    Get the unique uppercased token symbols of the current cache.
+    Returns (symbols tuple for fuzzy matching, frozenset for exact lookups).
+    """
+    return _symbols_upper_tuple, _symbols_set
+
+
+def get_chain_prefixed_token_list() -> Optional[str]:
+    """
+    Get the [CHAIN] SYMBOL listing (first 80 tokens) of the current cache.
+    Returns None until the cache has been filled.
+    """
+    return _chain_prefixed_text
+
+
 def get_token_symbols_list(tokens: List[Dict]) -> List[str]:
     """Extract just the symbol names from token list"""
+    if tokens is _token_cache:
+        return list(_symbols_list)
     return [t["symbol"] for t in tokens]
 
 
@@ -108,34 +184,38 @@ def get_token_symbols_with_chain(tokens: List[Dict]) -> List[str]:
     return [f"[{t.get('blockchain', 'near').upper()}] {t['symbol']}" for t in tokens]
 
 
+def get_tokens_by_symbol(symbol: str, tokens: List[Dict]) -> List[Dict]:
+    """Find all chain entries of a token by its symbol (case-insensitive)"""
+    symbol_upper = symbol.upper()
+    
+    # Cached list has a prebuilt symbol index; other lists are scanned
+    if tokens is _token_cache:
+        return list(_by_symbol_upper.get(symbol_upper, ()))
+    return [t for t in tokens if (t.get("symbol_upper") or t["symbol"].upper()) == symbol_upper]
+
+
 def get_token_by_symbol(symbol: str, tokens: List[Dict], chain: str = None) -> Optional[Dict]:
     """
     Find a token by its symbol (case-insensitive).
     If chain is specified, match both symbol and chain.
     If chain is None, prefer NEAR chain token.
     """
-    symbol_upper = symbol.upper()
+    candidates = get_tokens_by_symbol(symbol, tokens)
     
     # If chain specified, find exact match
     if chain:
         chain_lower = chain.lower()
-        for token in tokens:
-            if token["symbol"].upper() == symbol_upper and token.get("blockchain", "near").lower() == chain_lower:
+        for token in candidates:
+            if token.get("blockchain", "near").lower() == chain_lower:
                 return token
         return None
     
     # No chain specified - prefer NEAR chain
-    near_match = None
-    first_match = None
-    for token in tokens:
-        if token["symbol"].upper() == symbol_upper:
-            if first_match is None:
-                first_match = token
-            if token.get("blockchain", "near").lower() in ["near", "aurora"]:
-                near_match = token
-                break
-    
-    return near_match or first_match
+    for token in candidates:
+        if token.get("blockchain", "near").lower() in ["near", "aurora"]:
+            return token
+    
+    return candidates[0] if candidates else None
 
 
 def format_token_list_for_display(tokens: List[Dict]) -> str:
@@ -1,7 +1,11 @@
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any, Union
 
+import asyncio
+import json
+import logging
 import uuid
 import uvicorn
 import os
@@ -10,9 +14,14 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+# Agent logs are lazy; set LOG_LEVEL=DEBUG locally to see tool calls and responses
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "WARNING").upper())
+
 # Import our Agent logic
 from agents import process_message
 from knowledge_base import get_available_tokens_from_api, format_token_list_for_display
+import knowledge_base
+import hot_pay
 
 app = FastAPI(title="Neptune AI Agent")
 
@@ -24,9 +33,18 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("shutdown")
+async def close_http_clients():
+    """Release pooled HTTP connections held by the API clients"""
+    await knowledge_base.close_http_client()
+    await hot_pay.close_http_client()
+
 # In-memory session store
 sessions: Dict[str, Dict[str, Any]] = {}
 
+# Agent runs that outlived a disconnected /chat/stream client (kept referenced until done)
+_detached_agent_tasks: set = set()
+
 class ChatRequest(BaseModel):
     message: str
     session_id: str
@@ -39,51 +57,107 @@ class ChatResponse(BaseModel):
     action: Optional[str] = None
     payload: Optional[Union[Dict[str, Any], List[Any]]] = None
 
-@app.post("/chat", response_model=ChatResponse)
-async def chat_endpoint(request: ChatRequest):
-    session_id = request.session_id
-    user_msg = request.message
-    
-    # 1. Initialize or Retrieve Session
+def get_session(session_id: str) -> Dict[str, Any]:
+    """Initialize or retrieve a chat session"""
     if session_id not in sessions:
         sessions[session_id] = {
             "history": [],
             "state": {"step": "IDLE"} # Start in IDLE state
         }
-    
-    session_data = sessions[session_id]
-    current_state = session_data["state"]
-    history = session_data["history"]
-    
-    # 2. Process Message via Agent Orchestrator with conversation history
+    return sessions[session_id]
+
+def build_user_context(request: ChatRequest, history: List[Dict[str, str]]) -> Dict[str, Any]:
+    """Build the agent's user context from the request wallet info and history"""
     wallet_addresses = request.wallet_addresses or {}
     connected_chains = list(wallet_addresses.keys()) if wallet_addresses else []
     
-    user_context = {
+    return {
         "account_id": request.account_id,
         "connected_chains": connected_chains,
         "wallet_addresses": wallet_addresses,
         "balances": request.balances or {},
         "history": history  # Pass conversation history to agent
     }
-    result = await process_message(user_msg, current_state, user_context)
-    
-    # 3. Update Session State
+
+def save_turn(session_data: Dict[str, Any], user_msg: str, result: Dict[str, Any]) -> None:
+    """Store the agent's new state and append the exchange to history"""
     session_data["state"] = result.get("new_state", {"step": "IDLE"})
     
-    # 4. Update History
-    ai_text = result["response"]
+    history = session_data["history"]
     history.append({"role": "user", "content": user_msg})
-    history.append({"role": "ai", "content": ai_text})
+    history.append({"role": "ai", "content": result["response"]})
     if len(history) > 20:
         session_data["history"] = history[-20:]
 
+@app.post("/chat", response_model=ChatResponse)
+async def chat_endpoint(request: ChatRequest):
+    user_msg = request.message
+    
+    # 1. Initialize or Retrieve Session
+    session_data = get_session(request.session_id)
+    
+    # 2. Process Message via Agent Orchestrator with conversation history
+    user_context = build_user_context(request, session_data["history"])
+    result = await process_message(user_msg, session_data["state"], user_context)
+    
+    # 3. Update Session State and History
+    save_turn(session_data, user_msg, result)
+
     return ChatResponse(
-        response=ai_text,
+        response=result["response"],
         action=result.get("action"),
         payload=result.get("payload")
     )
 
+@app.post("/chat/stream")
+async def chat_stream_endpoint(request: ChatRequest):
+    """
+    Same as /chat, but streams the response as newline-delimited JSON:
+    {"type": "token", "content": ...} lines while the LLM generates, then a final
+    {"type": "done", "response": ..., "action": ..., "payload": ...} line
+    carrying the complete response.
+    """
+    user_msg = request.message
+    session_data = get_session(request.session_id)
+    user_context = build_user_context(request, session_data["history"])
+    tokens: asyncio.Queue = asyncio.Queue()
+    
+    async def run_agent() -> Dict[str, Any]:
+        try:
+            return await process_message(user_msg, session_data["state"], user_context, on_token=tokens.put)
+        finally:
+            await tokens.put(None)  # End-of-stream marker
+    
+    def save_finished_turn(task: asyncio.Task) -> None:
+        _detached_agent_tasks.discard(task)
+        if not task.cancelled() and task.exception() is None:
+            save_turn(session_data, user_msg, task.result())
+    
+    async def event_stream():
+        agent_task = asyncio.create_task(run_agent())
+        saved = False
+        try:
+            while (token := await tokens.get()) is not None:
+                yield json.dumps({"type": "token", "content": token}) + "\n"
+            
+            result = await agent_task
+            save_turn(session_data, user_msg, result)
+            saved = True
+            yield json.dumps({
+                "type": "done",
+                "response": result["response"],
+                "action": result.get("action"),
+                "payload": result.get("payload")
+            }) + "\n"
+        finally:
+            if not saved:
+                # Client went away mid-stream: let the agent finish and still record
+                # the turn (and its quote state) in the session history
+                _detached_agent_tasks.add(agent_task)
+                agent_task.add_done_callback(save_finished_turn)
+    
+    return StreamingResponse(event_stream(), media_type="application/x-ndjson")
+
 @app.get("/health")
 def health_check():
     return {"status": "ok"}
@@ -0,0 +1,34 @@
+"""
+Fuzzy token matching must keep the results of the original fuzzywuzzy-based
+implementation, including punctuation handling. Expected values were produced
+by that implementation (fuzzywuzzy + python-Levenshtein).
+"""
+import pytest
+
+from validators import fuzzy_match_token
+
+TOKENS = ["NEAR", "WNEAR", "ETH", "WETH", "USDC", "USDT", "USDC.E", "BTC", "WBTC", "SOL", "TRX", "AURORA"]
+
+
+@pytest.mark.parametrize("input_token, suggested, confidence, alternatives", [
+    (".SO", "SOL", 80, []),
+    ("eth.", "ETH", 100, ["WETH"]),
+    ("near!", "NEAR", 100, ["WNEAR"]),
+    ("USDC-E", "USDC.E", 100, ["USDC", "USDT"]),
+    ("$btc", "BTC", 100, ["WBTC"]),
+    ("wbtc-", "WBTC", 100, ["BTC", "WETH"]),
+    ("us_dc", "USDC", 89, ["USDC.E", "USDT"]),
+    ("naer", "NEAR", 75, ["WNEAR"]),
+    ("etherium", None, 0, ["ETH", "WETH"]),
+    ("...", None, 0, []),
+])
+def test_fuzzy_match_matches_fuzzywuzzy_results(input_token, suggested, confidence, alternatives):
+    match = fuzzy_match_token(input_token, TOKENS)
+    assert not match.exact_match
+    assert match.suggested_token == suggested
+    assert match.confidence == confidence
+    assert match.alternatives == alternatives
+
+
+def test_fuzzy_match_exact():
+    assert fuzzy_match_token(" near ", TOKENS) == (True, "NEAR", 100, [])
@@ -67,8 +67,8 @@ def is_cross_chain_swap(token_in: str, token_out: str) -> bool:
             return False
         
         # Find both tokens
-        token_in_data = get_token_by_symbol(token_in.upper(), tokens)
-        token_out_data = get_token_by_symbol(token_out.upper(), tokens)
+        token_in_data = get_token_by_symbol(token_in, tokens)
+        token_out_data = get_token_by_symbol(token_out, tokens)
         
         if not token_in_data or not token_out_data:
             print(f"[TOOLS] Warning: Could not find token data for {token_in} or {token_out}")
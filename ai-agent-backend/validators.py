@@ -2,9 +2,25 @@
 Validation utilities for wallet addresses and token names.
 Supports: NEAR, EVM, Solana, Tron, TON
 """
-from typing import Dict, Optional, List, Tuple
+from functools import lru_cache
+from typing import NamedTuple, Optional, List, Tuple
 import re
-from fuzzywuzzy import fuzz, process
+from rapidfuzz import fuzz, process
+
+# web3 is optional: without it EVM addresses are only format-checked
+try:
+    from web3 import Web3 as _WEB3
+except ImportError:
+    _WEB3 = None
+
+# Address patterns, compiled once at import
+_NEAR_IMPLICIT_RE = re.compile(r'^[a-f0-9]{64}$')
+_NEAR_NAMED_RE = re.compile(r'^[a-z0-9_-]{2,}(\.[a-z0-9_-]{2,})*\.?(near|testnet)$')
+_NEAR_SUBACCT_RE = re.compile(r'^[a-z0-9_-]{2,}(\.[a-z0-9_-]{2,})+$')
+_SOLANA_RE = re.compile(r'^[1-9A-HJ-NP-Za-km-z]{32,44}$')
+_TRON_RE = re.compile(r'^T[1-9A-HJ-NP-Za-km-z]{33}$')
+_TON_RAW_RE = re.compile(r'^-?[0-9]+:[a-fA-F0-9]{64}$')
+_TON_FRIENDLY_RE = re.compile(r'^(EQ|UQ)[A-Za-z0-9_-]{46,48}$')
 
 
 def validate_near_address(address: str) -> bool:
@@ -18,21 +34,23 @@ def validate_near_address(address: str) -> bool:
     if not address or not isinstance(address, str):
         return False
     
-    address = address.strip()
+    address = address.strip().lower()
+    n = len(address)
     
     # Check for implicit account (64 hex chars)
-    if re.match(r'^[a-f0-9]{64}$', address.lower()):
+    if n == 64 and _NEAR_IMPLICIT_RE.match(address):
         return True
     
-    # Check for named account
-    if re.match(r'^[a-z0-9_-]{2,}(\.[a-z0-9_-]{2,})*\.?(near|testnet)$', address.lower()):
-        return True
+    # NEAR account IDs are 2-64 characters
+    if n < 2 or n > 64:
+        return False
     
-    # Check for valid subaccount pattern without TLD
-    if re.match(r'^[a-z0-9_-]{2,}(\.[a-z0-9_-]{2,})+$', address.lower()):
+    # Check for named account (only possible with a near/testnet suffix)
+    if address.endswith(("near", "testnet")) and _NEAR_NAMED_RE.match(address):
         return True
     
-    return False
+    # Check for valid subaccount pattern without TLD (needs at least one dot)
+    return '.' in address and bool(_NEAR_SUBACCT_RE.match(address))
 
 
 def validate_evm_address(address: str) -> bool:
@@ -45,15 +63,17 @@ def validate_evm_address(address: str) -> bool:
     
     address = address.strip()
     
-    # Basic format check: 0x followed by 40 hex characters
-    if not re.match(r'^0x[a-fA-F0-9]{40}$', address):
+    # Basic format check: 0x followed by 40 hex characters (20 bytes)
+    if len(address) != 42 or not address.startswith('0x'):
         return False
-    
     try:
-        from web3 import Web3
-        return Web3.is_address(address)
-    except ImportError:
-        return True
+        # fromhex skips whitespace between bytes, so also require all 20 bytes
+        if len(bytes.fromhex(address[2:])) != 20:
+            return False
+    except ValueError:
+        return False
+    
+    return _WEB3.is_address(address) if _WEB3 is not None else True
 
 
 def validate_solana_address(address: str) -> bool:
@@ -67,7 +87,7 @@ def validate_solana_address(address: str) -> bool:
     address = address.strip()
     
     # Solana addresses: base58 chars (no 0, O, I, l), typically 32-44 chars
-    if not re.match(r'^[1-9A-HJ-NP-Za-km-z]{32,44}$', address):
+    if not _SOLANA_RE.match(address):
         return False
     
     return True
@@ -84,7 +104,7 @@ def validate_tron_address(address: str) -> bool:
     address = address.strip()
     
     # Tron address: starts with T, 34 chars, base58
-    if not re.match(r'^T[1-9A-HJ-NP-Za-km-z]{33}$', address):
+    if not _TRON_RE.match(address):
         return False
     
     return True
@@ -103,11 +123,11 @@ def validate_ton_address(address: str) -> bool:
     address = address.strip()
     
     # Raw format: 0:64hex or -1:64hex
-    if re.match(r'^-?[0-9]+:[a-fA-F0-9]{64}$', address):
+    if _TON_RAW_RE.match(address):
         return True
     
     # User-friendly format: EQ or UQ prefix, base64url, ~48 chars
-    if re.match(r'^(EQ|UQ)[A-Za-z0-9_-]{46,48}$', address):
+    if _TON_FRIENDLY_RE.match(address):
         return True
     
     return False
@@ -198,80 +218,198 @@ def get_chain_address_format(chain: str) -> str:
 
 # ─── Token Matching ───────────────────────────────────────
 
+class FuzzyMatch(NamedTuple):
+    """Result of matching one token name against the available tokens"""
+    exact_match: bool
+    suggested_token: Optional[str]
+    confidence: int
+    alternatives: List[str]
+
+
+@lru_cache(maxsize=8)
+def _upper_tuple(tokens: Tuple[str, ...]) -> Tuple[str, ...]:
+    """Uppercased token universe, cached since the same list is matched repeatedly"""
+    return tuple(t.upper() for t in tokens)
+
+
+@lru_cache(maxsize=8)
+def _upper_set(available_upper: Tuple[str, ...]) -> frozenset:
+    """Hash set of an uppercased token universe for exact-match probes"""
+    return frozenset(available_upper)
+
+
+# Same normalization fuzzywuzzy's process.extract applied by default (utils.full_process):
+# every non-word character becomes a space, then lowercase and trim
+_NON_WORD_RE = re.compile(r"\W")
+
+
+def _process_token(token: str) -> str:
+    return _NON_WORD_RE.sub(" ", token).lower().strip()
+
+
+@lru_cache(maxsize=8)
+def _processed_tuple(available_upper: Tuple[str, ...]) -> Tuple[str, ...]:
+    """Fuzzy-matching form of each token, index-aligned with available_upper"""
+    return tuple(_process_token(t) for t in available_upper)
+
+
+@lru_cache(maxsize=64)
+def _length_candidates(available_upper: Tuple[str, ...], query_len: int) -> Tuple[Tuple[int, ...], Tuple[str, ...]]:
+    """
+    Indexes and processed forms of the tokens whose processed length allows a
+    fuzz.ratio that rounds to 50 (>= 49.5) against a processed query of query_len
+    characters. ratio <= 200 * min(n, m) / (n + m), so only lengths in
+    [99n / 301, 301n / 99] can reach it; everything else is skipped without
+    computing a distance. Original order is kept so tie-breaking is unchanged.
+    """
+    lo, hi = -(-99 * query_len // 301), 301 * query_len // 99
+    processed = _processed_tuple(available_upper)
+    indexes = tuple(i for i, t in enumerate(processed) if lo <= len(t) <= hi)
+    return indexes, tuple(processed[i] for i in indexes)
+
+
 def fuzzy_match_token(
     input_token: str, 
     available_tokens: List[str],
     threshold: int = 70
-) -> Dict[str, any]:
+) -> FuzzyMatch:
     """
     Find the best matching token from available tokens using fuzzy matching.
     """
-    if not input_token or not available_tokens:
-        return {
-            'exact_match': False,
-            'suggested_token': None,
-            'confidence': 0,
-            'alternatives': []
-        }
-    
-    input_upper = input_token.upper().strip()
-    available_upper = [t.upper() for t in available_tokens]
-    
-    # Check for exact match first
-    if input_upper in available_upper:
-        return {
-            'exact_match': True,
-            'suggested_token': input_upper,
-            'confidence': 100,
-            'alternatives': []
-        }
-    
-    # Use fuzzy matching to find best match
-    matches = process.extract(input_upper, available_upper, scorer=fuzz.ratio, limit=3)
-    
-    if not matches or matches[0][1] < threshold:
-        return {
-            'exact_match': False,
-            'suggested_token': None,
-            'confidence': 0,
-            'alternatives': [m[0] for m in matches if m[1] >= 50]
-        }
-    
-    best_match, confidence = matches[0]
-    alternatives = [m[0] for m in matches[1:] if m[1] >= 50]
-    
-    return {
-        'exact_match': False,
-        'suggested_token': best_match,
-        'confidence': confidence,
-        'alternatives': alternatives
-    }
+    available_upper, upper_set = _prepare_token_universe(available_tokens)
+    return _fuzzy_match_token_core(input_token, available_upper, upper_set, threshold)
+
+
+def _prepare_token_universe(available_tokens: List[str]) -> Tuple[Tuple[str, ...], frozenset]:
+    """Uppercased tuple and set of available tokens (cached per token list)"""
+    if not available_tokens:
+        return (), frozenset()
+    available_upper = _upper_tuple(tuple(available_tokens))
+    return available_upper, _upper_set(available_upper)
+
+
+def _fuzzy_match_token_core(
+    input_token: str,
+    available_upper: Tuple[str, ...],
+    upper_set: frozenset,
+    threshold: int = 70
+) -> FuzzyMatch:
+    """
+    fuzzy_match_token against a prepared (uppercased) token universe.
+    """
+    if not input_token or not available_upper:
+        return FuzzyMatch(
+            exact_match=False,
+            suggested_token=None,
+            confidence=0,
+            alternatives=[]
+        )
+    
+    input_upper = input_token.strip().upper()
+    
+    # Check for exact match first (single hash probe, skips fuzzy matching)
+    if input_upper in upper_set:
+        return FuzzyMatch(
+            exact_match=True,
+            suggested_token=input_upper,
+            confidence=100,
+            alternatives=[]
+        )
+    
+    # Use fuzzy matching on the processed forms. Scores are rounded to integers and
+    # ties keep token order, as fuzzywuzzy did; anything rounding below 50 is dropped
+    # inside rapidfuzz via score_cutoff
+    query = _process_token(input_upper)
+    indexes, candidates = _length_candidates(available_upper, len(query))
+    scored = process.extract(
+        query, candidates,
+        scorer=fuzz.ratio, processor=None, limit=None, score_cutoff=49.5
+    )
+    matches = sorted(((round(score), indexes[i]) for _, score, i in scored), key=lambda m: (-m[0], m[1]))[:3]
+    
+    if not matches or matches[0][0] < threshold:
+        return FuzzyMatch(
+            exact_match=False,
+            suggested_token=None,
+            confidence=0,
+            alternatives=[available_upper[i] for _, i in matches]
+        )
+    
+    confidence, best_index = matches[0]
+    best_match = available_upper[best_index]
+    alternatives = [available_upper[i] for _, i in matches[1:]]
+    
+    return FuzzyMatch(
+        exact_match=False,
+        suggested_token=best_match,
+        confidence=confidence,
+        alternatives=alternatives
+    )
 
 
 def validate_token_pair(token_in: str, token_out: str, available_tokens: List[str]) -> Tuple[bool, str, Optional[str], Optional[str]]:
     """
     Validate and potentially correct a token pair.
+    Results are memoized when available_tokens is a tuple (e.g. the symbols from
+    knowledge_base.get_prepared_symbols), for as long as that tuple is passed.
     """
-    match_in = fuzzy_match_token(token_in, available_tokens)
-    match_out = fuzzy_match_token(token_out, available_tokens)
+    global _current_universe
+    
+    # Lists may change in place, so only immutable universes are memoized
+    if not isinstance(available_tokens, tuple):
+        return _validate_token_pair_impl(token_in, token_out, available_tokens)
+    
+    universe = _current_universe
+    if universe is None or universe.tokens is not available_tokens:
+        # New token universe: old results can never hit again, release them
+        universe = _TokenUniverse(available_tokens)
+        _current_universe = universe
+        _validate_pair_in_universe.cache_clear()
+    return _validate_pair_in_universe(token_in, token_out, universe)
+
+
+class _TokenUniverse:
+    """
+    Identity-hashed handle on a token tuple. As part of a memo key it hashes in
+    O(1) and ties each cached result to the universe it was computed against.
+    """
+    __slots__ = ("tokens",)
+    
+    def __init__(self, tokens: Tuple[str, ...]):
+        self.tokens = tokens
+
+
+_current_universe: Optional[_TokenUniverse] = None
+
+
+@lru_cache(maxsize=256)
+def _validate_pair_in_universe(token_in: str, token_out: str, universe: _TokenUniverse) -> Tuple[bool, str, Optional[str], Optional[str]]:
+    return _validate_token_pair_impl(token_in, token_out, universe.tokens)
+
+
+def _validate_token_pair_impl(token_in: str, token_out: str, available_tokens: List[str]) -> Tuple[bool, str, Optional[str], Optional[str]]:
+    # Prepare the token universe once for both lookups
+    available_upper, upper_set = _prepare_token_universe(available_tokens)
+    match_in = _fuzzy_match_token_core(token_in, available_upper, upper_set)
+    match_out = _fuzzy_match_token_core(token_out, available_upper, upper_set)
     
     # Both exact matches - all good
-    if match_in['exact_match'] and match_out['exact_match']:
+    if match_in.exact_match and match_out.exact_match:
         return True, "Valid token pair", token_in.upper(), token_out.upper()
     
     # Handle input token issues
-    if not match_in['exact_match']:
-        if match_in['suggested_token']:
-            if match_out['exact_match'] or match_out['suggested_token']:
-                return False, f"Did you mean {match_in['suggested_token']} instead of {token_in}?", match_in['suggested_token'], match_out.get('suggested_token') or token_out.upper()
+    if not match_in.exact_match:
+        if match_in.suggested_token:
+            if match_out.exact_match or match_out.suggested_token:
+                return False, f"Did you mean {match_in.suggested_token} instead of {token_in}?", match_in.suggested_token, match_out.suggested_token or token_out.upper()
         else:
-            return False, f"Token '{token_in}' not recognized. Available alternatives: {', '.join(match_in['alternatives'][:3]) if match_in['alternatives'] else 'none'}", None, None
+            return False, f"Token '{token_in}' not recognized. Available alternatives: {', '.join(match_in.alternatives[:3]) if match_in.alternatives else 'none'}", None, None
     
     # Handle output token issues
-    if not match_out['exact_match']:
-        if match_out['suggested_token']:
-            return False, f"Did you mean {match_out['suggested_token']} instead of {token_out}?", match_in.get('suggested_token') or token_in.upper(), match_out['suggested_token']
+    if not match_out.exact_match:
+        if match_out.suggested_token:
+            return False, f"Did you mean {match_out.suggested_token} instead of {token_out}?", match_in.suggested_token or token_in.upper(), match_out.suggested_token
         else:
-            return False, f"Token '{token_out}' not recognized. Available alternatives: {', '.join(match_out['alternatives'][:3]) if match_out['alternatives'] else 'none'}", None, None
+            return False, f"Token '{token_out}' not recognized. Available alternatives: {', '.join(match_out.alternatives[:3]) if match_out.alternatives else 'none'}", None, None
     
-    return True, "Valid token pair", match_in.get('suggested_token') or token_in.upper(), match_out.get('suggested_token') or token_out.upper()
+    return True, "Valid token pair", match_in.suggested_token or token_in.upper(), match_out.suggested_token or token_out.upper()